@@ -1,41 +1,34 @@
 from dotenv import load_dotenv
-load_dotenv()
 import os
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from selectolax.lexbor import LexborHTMLParser
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import re
-import pymongo
+import hashlib
+import json
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, OperationFailure
 import certifi
 import logging
 import time
 
 # Configure logging: you can adjust the level (DEBUG, INFO, etc.) as needed.
+# Per-page and per-tender messages are logged at DEBUG, so they are off by default.
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-# --- MongoDB Setup ---
-MONGO_URI = os.environ.get("MONGO_URI")
-if not MONGO_URI:
-    logger.error("MONGO_URI not set in environment")
-    raise Exception("Please set the MONGO_URI environment variable.")
-
-try:
-    client = pymongo.MongoClient(MONGO_URI, tls=True, tlsCAFile=certifi.where())
-    logger.info("Connected to MongoDB. Databases: %s", client.list_database_names())
-except Exception as e:
-    logger.error("Failed to connect to MongoDB: %s", e)
-    raise e
-
-db = client["tender_db"]
-tender_collection = db["tenders"]
-
-logger.info("EMAIL_FROM: %s", os.environ.get("EMAIL_FROM"))
+# Environment-dependent setup (.env loading, MongoDB client, department list)
+# happens in main(), not at import time: parser workers are spawned and
+# re-import this module, and must not repeat it.
 
 # --- Constants ---
 BASE_URL = "https://eproc.rajasthan.gov.in"
@@ -45,37 +38,260 @@ headers = {
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
         "AppleWebKit/605.1.15 (KHTML, like Gecko) "
         "Version/15.0 Safari/605.1.15"
-    )
+    ),
+    "Accept-Encoding": "gzip, deflate, br",
 }
 
-# Create a persistent session object.
-session = requests.Session()
+# Precompiled patterns used on every tender.
+_SAFE_URL_RE = re.compile(r'[^a-zA-Z0-9]')
+_NON_DIGITS = re.compile(r"[^\d]")
+# Total page size from a "bytes 0-N/total" Content-Range header.
+_CONTENT_RANGE_TOTAL_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+# Raw-HTML lookup of the "Tender Value in ₹" caption cell and the value cell after it.
+# Pages are kept as raw bytes, so the pattern is UTF-8 encoded too.
+_VALUE_RE = re.compile(
+    r"Tender Value in\s*₹\s*</td>\s*<td[^>]*>([^<]+)</td>".encode("utf-8"), re.S | re.I
+)
+
+# Only tenders valued below this (or with no value) are reported.
+MAX_TENDER_VALUE = 3000000
+
+# Captions read from the tender detail page:
+# label -> (result key, caption tag, required class of the caption or None).
+# Date captions are bold text inside a <td>; the others are the <td> itself.
+# In both cases the value is the text of the next sibling <td>.
+DETAIL_LABELS = {
+    "Published Date": ("published_date", "b", None),
+    "Document Download / Sale Start Date": ("sale_start_date", "b", None),
+    "Clarification Start Date": ("clarification_start_date", "b", None),
+    "Bid Submission Start Date": ("bid_submission_start_date", "b", None),
+    "Bid Opening Date": ("bid_opening_date", "b", None),
+    "Sale End Date": ("sale_end_date", "b", None),
+    "Clarification End Date": ("clarification_end_date", "b", None),
+    "Bid Submission End Date": ("bid_submission_end_date", "b", None),
+    "Tender Value in ₹": ("tender_value", "td", None),
+    "Tender Type": ("tender_type", "td", "td_caption"),
+}
+DATE_KEYS = [key for key, tag, _ in DETAIL_LABELS.values() if tag == "b"]
+# One alternation over every caption, so each node's text is matched in a single
+# native regex search instead of a Python loop over the labels.
+_LABEL_RE = re.compile("|".join(re.escape(label) for label in DETAIL_LABELS))
+
+# Flush queued tender inserts to MongoDB once this many have accumulated.
+INSERT_BATCH_SIZE = 500
+
+# Maximum number of tender detail pages fetched concurrently.
+CONCURRENCY = 20
+
+# Size of the keep-alive connection pool shared by all requests.
+POOL_SIZE = 32
+
+# Retry policy for transient failures: retries after the first attempt,
+# exponential backoff factor in seconds, and HTTP statuses worth retrying.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Bytes requested up front for a tender detail page; enough to reach the tender
+# value cell so over-limit tenders are skipped without downloading the rest.
+PREFIX_BYTES = 65536
+# Cleared the first time the server answers a ranged request with the whole
+# page (200 instead of 206); tender pages are then fetched in full, compressed.
+range_requests_supported = True
+
+# Full pages served with an ETag or Last-Modified header are kept here and
+# revalidated with a conditional GET on later runs.
+CACHE_DIR = "tender_cache"
+
+def get_departments_to_search():
+    """
+    Returns the list of department names to search, read from DEPARTMENTS.
+    """
+    departments_to_search = os.environ.get("DEPARTMENTS").split(",")
+    # Optionally, strip extra whitespace:
+    return [dept.strip() for dept in departments_to_search]
+
+def cache_path(url):
+    """
+    Returns the cache path for the URL, without extension: the page body is
+    stored as <path>.html and its validators as <path>.json.
+    """
+    return os.path.join(CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest())
 
-# List of department names to search.
-departments_to_search = os.environ.get("DEPARTMENTS").split(",")
-# Optionally, strip extra whitespace:
-departments_to_search = [dept.strip() for dept in departments_to_search]
+def load_cached_page(url):
+    """
+    Returns the cached entry for the URL (a dict with "etag", "last_modified"
+    and "body"), or None if the page is not cached or the entry is unreadable.
+    Reading an entry marks it as used in this run, so prune_cache keeps it.
+    """
+    path = cache_path(url)
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path + ".html", "rb") as f:
+            body = f.read()
+        os.utime(path + ".json")
+        os.utime(path + ".html")
+    except (OSError, ValueError):
+        return None
+    if not isinstance(meta, dict):
+        return None
+    return {"etag": meta.get("etag"), "last_modified": meta.get("last_modified"), "body": body}
 
-def fetch_page(url):
+def save_cached_page(url, response_headers, body):
+    """
+    Stores the page body with its validators, if the server sent any.
+    The body is written first, so a sidecar always points at a complete body.
     """
-    Use a persistent session to fetch the page.
+    etag = response_headers.get("ETag")
+    last_modified = response_headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(url)
+    with open(path + ".html.tmp", "wb") as f:
+        f.write(body)
+    os.replace(path + ".html.tmp", path + ".html")
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump({"etag": etag, "last_modified": last_modified}, f)
+    os.replace(path + ".json.tmp", path + ".json")
+
+def prune_cache(run_started):
+    """
+    Removes cache files that were neither read nor written since run_started
+    (pages that are no longer listed), so the cache does not grow forever.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+    removed = 0
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < run_started:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            logger.warning("Could not prune cache file %s: %s", path, e)
+    logger.info("Pruned %d stale cache files.", removed)
+
+def covers_whole_page(response_headers, body, byte_range):
+    """
+    Tells whether a 206 response to a bytes=0-byte_range request already holds
+    the whole page: by the total size in Content-Range when the server sends
+    it, otherwise by the server returning fewer bytes than were asked for.
+    """
+    m = _CONTENT_RANGE_TOTAL_RE.match(response_headers.get("Content-Range", ""))
+    if m:
+        return len(body) >= int(m.group(1))
+    return len(body) <= byte_range
+
+async def get_with_retries(session, url, request_headers=None):
+    """
+    GET the URL and return the response status, headers and raw body bytes.
+    Connection errors, timeouts and statuses in RETRY_STATUSES are retried up
+    to MAX_RETRIES times with backoff.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with session.get(url, headers=request_headers) as response:
+                if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                    return response.status, response.headers, await response.read()
+                logger.warning("Got HTTP %d for %s. Retrying.", response.status, url)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logger.warning("Error fetching %s: %s. Retrying.", url, e)
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def fetch_response(session, url, byte_range=None):
+    """
+    Use a persistent aiohttp session to fetch the page.
     If the response indicates a timed-out session, restart the session.
+    With byte_range set, only the first byte_range + 1 bytes are requested; the
+    status is 206 only if the body is a truncated prefix of the page, and 200
+    if it is the whole page (the server ignored the range, or the page fits).
+    Full pages are revalidated against the disk cache, and a 304 answer is
+    served from it. Returns (status, undecoded page bytes), or (None, None) on
+    failure.
     """
-    logger.info("Fetching URL: %s", url)
+    global range_requests_supported
+    logger.debug("Fetching URL: %s", url)
+    cached = None
+    request_headers = {}
+    if byte_range is not None:
+        # Ranges apply to the encoded body, so ask for it uncompressed.
+        request_headers = {"Range": f"bytes=0-{byte_range}", "Accept-Encoding": "identity"}
+    else:
+        cached = load_cached_page(url)
+        if cached:
+            if cached["etag"]:
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                request_headers["If-Modified-Since"] = cached["last_modified"]
     try:
-        response = session.get(url, headers=headers)
-        response.raise_for_status()
-        if "Your session has timed out" in response.text:
+        status, response_headers, content = await get_with_retries(session, url, request_headers)
+        if b"Your session has timed out" in content:
             logger.warning("Session timed out. Restarting session for URL: %s", url)
             restart_url = BASE_URL + "/nicgep/app?service=restart"
-            session.get(restart_url, headers=headers)
-            response = session.get(url, headers=headers)
-            response.raise_for_status()
-        logger.info("Successfully fetched URL: %s", url)
-        return response.text
-    except requests.RequestException as e:
+            await get_with_retries(session, restart_url)
+            status, response_headers, content = await get_with_retries(session, url, request_headers)
+        if status == 304 and cached:
+            logger.debug("Page not modified, using cached copy: %s", url)
+            return 200, cached["body"]
+        if byte_range is not None and status == 200 and range_requests_supported:
+            range_requests_supported = False
+            logger.info("Server ignores Range requests; fetching tender pages in full.")
+        if status == 206 and covers_whole_page(response_headers, content, byte_range):
+            status = 200
+        if status == 200:
+            save_cached_page(url, response_headers, content)
+        logger.debug("Successfully fetched URL: %s", url)
+        return status, content
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Error fetching %s: %s", url, e)
-        return None
+        return None, None
+
+async def fetch_page(session, url):
+    """
+    Fetch the whole page and return its undecoded bytes, or None on failure.
+    """
+    _, content = await fetch_response(session, url)
+    return content
+
+async def fetch_tender(session, semaphore, parse_pool, tender_url):
+    """
+    Fetch a tender detail page (bounded by the semaphore) and parse it in the
+    process pool so HTML parsing runs on all cores, outside the GIL, while
+    other downloads are in flight. While the server honours Range requests,
+    only the first PREFIX_BYTES are requested at first; the rest of the page is
+    fetched only if the page was truncated and the prefix does not already show
+    the tender is over the value limit. Pages over the limit are skipped here,
+    without being parsed.
+    Returns a (tender_url, detail_html, tender_values) tuple.
+    """
+    async with semaphore:
+        logger.debug("Processing tender URL: %s", tender_url)
+        # A cached page is revalidated in full; a 304 is cheaper than a prefix.
+        byte_range = None
+        if range_requests_supported and not os.path.exists(cache_path(tender_url) + ".json"):
+            byte_range = PREFIX_BYTES
+        status, detail_html = await fetch_response(session, tender_url, byte_range)
+        if byte_range is not None and detail_html is None:
+            # The ranged GET itself failed (e.g. 416); retry as a plain fetch.
+            status, detail_html = await fetch_response(session, tender_url)
+        # The only raw-HTML prescan: it runs on the prefix or the full page,
+        # whichever was fetched, before any further download or parsing.
+        if detail_html and is_over_value_limit(detail_html):
+            logger.debug("Tender value >= %d", MAX_TENDER_VALUE)
+            return tender_url, detail_html, {"tender_id": "SKIP"}
+        if status == 206:
+            detail_html = await fetch_page(session, tender_url)
+    if not detail_html:
+        return tender_url, None, None
+    loop = asyncio.get_running_loop()
+    tender_values = await loop.run_in_executor(parse_pool, get_tender_value, detail_html)
+    return tender_url, detail_html, tender_values
 
 
 def save_failed_html(html, tender_url):
@@ -89,11 +305,11 @@ def save_failed_html(html, tender_url):
         os.makedirs(directory)
     
     # Create a safe filename using a sanitized version of the tender URL and a timestamp
-    safe_url = re.sub(r'[^a-zA-Z0-9]', '_', tender_url)
+    safe_url = _SAFE_URL_RE.sub('_', tender_url)
     filename = os.path.join(directory, f"failed_{safe_url}_{int(time.time())}.txt")
     
     with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
+        f.write(html.decode("utf-8", "replace"))
     
     logger.info("Saved failed tender HTML to %s", filename)
 
@@ -102,33 +318,31 @@ def get_department_table(html):
     Get the department table from the main page.
     (Here we assume it is the third table with class "list_table" – adjust if needed.)
     """
-    soup = BeautifulSoup(html, "html.parser")
-    tables = soup.find_all("table", class_="list_table")
+    tables = LexborHTMLParser(html).css("table.list_table")
     if not tables or len(tables) < 3:
         logger.error("Desired department table not found!")
         return None
     logger.info("Found department table.")
     return tables[2]
 
-def extract_department_link(department_table, dept_name):
+def build_department_index(department_table):
     """
-    In the department table, search each row for a department whose
-    organisation name exactly matches dept_name. Return the full URL.
+    Walk the department table once and map each organisation name to the full
+    URL of its tender list. The first row with a link wins for duplicate names.
     """
-    for row in department_table.find_all("tr"):
-        cells = row.find_all("td")
+    dept_index = {}
+    for row in department_table.css("tr"):
+        cells = row.css("td")
         if len(cells) < 3:
             continue
-        org_name = cells[1].get_text(strip=True)
-        if org_name == dept_name:
-            a_tag = cells[2].find("a")
-            if a_tag and a_tag.has_attr("href"):
-                relative_link = a_tag["href"].strip()
-                full_link = BASE_URL + relative_link
-                logger.info("Found department '%s' link: %s", dept_name, full_link)
-                return full_link
-    logger.warning("Department '%s' not found in table.", dept_name)
-    return None
+        a_tag = cells[2].css_first("a")
+        # A valueless <a href> has an attribute value of None.
+        relative_link = (a_tag.attributes.get("href") or "").strip() if a_tag else ""
+        if relative_link:
+            org_name = cells[1].text(strip=True)
+            dept_index.setdefault(org_name, BASE_URL + relative_link)
+    logger.info("Indexed %d departments.", len(dept_index))
+    return dept_index
 
 def get_tender_links_from_org_page(org_html):
     """
@@ -136,75 +350,99 @@ def get_tender_links_from_org_page(org_html):
     with class "list_table" and extract all tender links from the column containing
     "Title and Ref.No./Tender ID" (assumed to be the 5th column).
     """
-    soup = BeautifulSoup(org_html, "html.parser")
-    table = soup.find_all("table", class_="list_table")[0]
+    table = LexborHTMLParser(org_html).css_first("table.list_table")
+    if table is None:
+        logger.error("Tender table not found on organisation page.")
+        return []
     tender_links = []
-    for row in table.find_all("tr"):
-        cells = row.find_all("td")
-        if len(cells) < 5:
-            continue
-        a_tag = cells[4].find("a")
-        if a_tag and a_tag.has_attr("href"):
-            relative_link = a_tag["href"].strip()
-            full_link = BASE_URL + relative_link
-            tender_links.append(full_link)
+    for cell in table.css("tr > td:nth-child(5)"):
+        a_tag = cell.css_first("a")
+        # A valueless <a href> has an attribute value of None.
+        relative_link = (a_tag.attributes.get("href") or "").strip() if a_tag else ""
+        if relative_link:
+            tender_links.append(BASE_URL + relative_link)
     logger.info("Extracted %d tender links from organisation page.", len(tender_links))
     return tender_links
 
-def get_tender_dates(soup):
+def node_string(node):
     """
-    Extracts tender dates from the BeautifulSoup parsed HTML.
-    Returns a dictionary with the date information.
+    Returns the text of a node whose only child is a text node (following a
+    chain of single children), like BeautifulSoup's Tag.string; otherwise None.
     """
-    def extract_date(label):
-        b_tag = soup.find("b", string=lambda text: text and label in text)
-        if b_tag:
-            parent_td = b_tag.find_parent("td")
-            if parent_td:
-                next_td = parent_td.find_next_sibling("td")
-                if next_td:
-                    return next_td.get_text(strip=True)
+    child = node.child
+    if child is None or child.next is not None:
         return None
+    if child.tag == "-text":
+        return child.text()
+    return node_string(child)
 
-    tender_dates = {
-        "published_date": extract_date("Published Date"),
-        "sale_start_date": extract_date("Document Download / Sale Start Date"),
-        "clarification_start_date": extract_date("Clarification Start Date"),
-        "bid_submission_start_date": extract_date("Bid Submission Start Date"),
-        "bid_opening_date": extract_date("Bid Opening Date"),
-        "sale_end_date": extract_date("Sale End Date"),
-        "clarification_end_date": extract_date("Clarification End Date"),
-        "bid_submission_end_date": extract_date("Bid Submission End Date")
-    }
-    logger.debug("Tender dates extracted: %s", tender_dates)
-    return tender_dates
+def find_parent_td(node):
+    """
+    Returns the closest <td> ancestor of the node, or None.
+    """
+    node = node.parent
+    while node is not None and node.tag != "td":
+        node = node.parent
+    return node
 
-def extract_value(soup, label):
+def find_next_sibling_td(node):
     """
-    Finds a <td> with class 'td_caption' whose text (even if nested) contains the given label,
-    then returns the text from its immediate sibling <td>.
+    Returns the next <td> sibling of the node (skipping text nodes), or None.
     """
-    td = soup.find("td", class_="td_caption", string=lambda text: text and re.search(label, text, re.IGNORECASE))
-    if td:
-        sibling = td.find_next_sibling("td")
-        if sibling:
-            value = sibling.get_text(strip=True)
-            logger.debug("Extracted value for label '%s': %s", label, value)
-            return value
-    logger.warning("Could not extract value for label: %s", label)
-    return None
+    node = node.next
+    while node is not None and node.tag != "td":
+        node = node.next
+    return node
+
+def extract_labelled_values(tree):
+    """
+    Walks every <b> and <td> in the parsed detail page once and collects the
+    value next to each caption in DETAIL_LABELS. The first match for a label wins.
+    Returns a dictionary keyed by the result keys of DETAIL_LABELS.
+    """
+    values = {}
+    for tag in tree.css("b, td"):
+        text = node_string(tag)
+        if not text:
+            continue
+        m = _LABEL_RE.search(text)
+        if not m:
+            continue
+        label = m.group(0)
+        key, caption_tag, caption_class = DETAIL_LABELS[label]
+        if tag.tag != caption_tag or key in values:
+            continue
+        if caption_class and caption_class not in (tag.attributes.get("class") or "").split():
+            continue
+        caption_td = find_parent_td(tag) if caption_tag == "b" else tag
+        next_td = find_next_sibling_td(caption_td) if caption_td else None
+        if next_td:
+            values[key] = next_td.text(strip=True)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Extracted value for label '%s': %s", label, values[key])
+    return values
+
+def get_tender_dates(values):
+    """
+    Picks the tender dates out of the values collected by extract_labelled_values.
+    Returns a dictionary with the date information.
+    """
+    tender_dates = {key: values.get(key) for key in DATE_KEYS}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Tender dates extracted: %s", tender_dates)
+    return tender_dates
 
-def get_tender_id_organization_chain(soup):
+def get_tender_id_organization_chain(tree):
     """
     Extracts the tender id and organization chain from the tender detail page.
     Assumes the first row contains the organization chain and the third row contains the tender id.
     """
-    table = soup.find("table", class_="tablebg")
+    table = tree.css_first("table.tablebg")
     if not table:
         logger.error("Could not find table with class 'tablebg'.")
         return None, None
 
-    rows = table.find_all("tr")
+    rows = table.css("tr")
     if len(rows) < 3:
         logger.error("Not enough rows in the table to extract tender id and organization chain.")
         return None, None
@@ -212,66 +450,148 @@ def get_tender_id_organization_chain(soup):
     first_row = rows[0]
     third_row = rows[2]
 
-    tender_id_tds = third_row.find_all("td")
-    organisation_chain_tds = first_row.find_all("td")
+    tender_id_tds = third_row.css("td")
+    organisation_chain_tds = first_row.css("td")
 
     try:
-        tender_id = tender_id_tds[1].find("b").get_text(strip=True)
-        tender_organization_chain = organisation_chain_tds[1].find("b").get_text(strip=True)
-        logger.info("Extracted Tender ID: %s", tender_id)
-        logger.info("Extracted Organisation Chain: %s", tender_organization_chain)
+        tender_id = tender_id_tds[1].css_first("b").text(strip=True)
+        tender_organization_chain = organisation_chain_tds[1].css_first("b").text(strip=True)
+        logger.debug("Extracted Tender ID: %s", tender_id)
+        logger.debug("Extracted Organisation Chain: %s", tender_organization_chain)
     except Exception as e:
         logger.error("Error extracting tender id or organization chain: %s", e)
         return None, None
 
     return tender_id, tender_organization_chain
 
+def parse_tender_value(value_text):
+    """
+    Converts the text of the tender value cell to an int.
+    Returns None when the value is "NA" or empty; raises ValueError otherwise.
+    """
+    if "NA" in value_text.upper() or not value_text.strip():
+        return None
+    # Drop any paise part, then strip "₹", commas and spaces in one pass.
+    clean_text = _NON_DIGITS.sub("", value_text.split(".", 1)[0])
+    return int(clean_text)
+
+def is_over_value_limit(detail_html):
+    """
+    Looks up the tender value cell in the raw HTML, without building a parse
+    tree. Returns True only if the value is found and is at least MAX_TENDER_VALUE.
+    """
+    m = _VALUE_RE.search(detail_html)
+    if not m:
+        return False
+    try:
+        tender_value = parse_tender_value(m.group(1).decode("utf-8", "replace"))
+    except ValueError:
+        return False
+    return tender_value is not None and tender_value >= MAX_TENDER_VALUE
+
 def get_tender_value(detail_html):
     """
     Extracts tender details from the tender detail page.
-    Only returns data for tenders with a value less than 3000000.
+    Only returns data for tenders with a value less than MAX_TENDER_VALUE.
     """
-    soup = BeautifulSoup(detail_html, "html.parser")
-    tender_dates = get_tender_dates(soup)
-    
-    label_td = soup.find("td", string=lambda text: text and "Tender Value in ₹" in text)
-    if label_td:
-        value_td = label_td.find_next_sibling("td")
-        if value_td:
-            value_text = value_td.get_text(strip=True)
-            clean_text = value_text.replace(",", "").replace("₹", "").strip()
-            try:
-                # If the cleaned text is "NA" (or empty), set tender_value to None
-                if clean_text.upper() == "NA" or clean_text == "":
-                    tender_value = None
-                    logger.info("Tender value not available (NA).")
-                else:
-                    tender_value = int(float(clean_text))
-                    logger.info("Tender value extracted: %d", tender_value)
-
-                if tender_value is None or tender_value < 3000000:
-                    tender_id, tender_organization_chain = get_tender_id_organization_chain(soup)
-                    tender_type = extract_value(soup, "Tender Type")
-                    
-                    return {
-                        "tender_id": tender_id,
-                        "tender_value": tender_value,
-                        "tender_organization_chain": tender_organization_chain,
-                        "tender_type": tender_type,
-                        "tender_dates": tender_dates
-                    }
-                else:
-                    logger.warning("Tender value >= 3000000")
-                    return {
-                        "tender_id": "SKIP"
-                    }
-            except ValueError:
-                logger.error("Could not convert tender value: %s", clean_text)
-                return None
-    logger.warning("Tender value not found or tender_value >= 3000000")
+    tree = LexborHTMLParser(detail_html)
+    values = extract_labelled_values(tree)
+    tender_dates = get_tender_dates(values)
+
+    value_text = values.get("tender_value")
+    if value_text is not None:
+        try:
+            # If the value is "NA" (or empty), tender_value is None
+            tender_value = parse_tender_value(value_text)
+            if tender_value is None:
+                logger.debug("Tender value not available (NA).")
+            else:
+                logger.debug("Tender value extracted: %d", tender_value)
+
+            if tender_value is None or tender_value < MAX_TENDER_VALUE:
+                tender_id, tender_organization_chain = get_tender_id_organization_chain(tree)
+                tender_type = values.get("tender_type")
+                if tender_type is None:
+                    logger.warning("Could not extract value for label: %s", "Tender Type")
+                
+                return {
+                    "tender_id": tender_id,
+                    "tender_value": tender_value,
+                    "tender_organization_chain": tender_organization_chain,
+                    "tender_type": tender_type,
+                    "tender_dates": tender_dates
+                }
+            else:
+                logger.debug("Tender value >= %d", MAX_TENDER_VALUE)
+                return {
+                    "tender_id": "SKIP"
+                }
+        except ValueError:
+            logger.error("Could not convert tender value: %s", value_text)
+            return None
+    logger.warning("Tender value not found.")
     return None
 
-def send_email(body):
+async def connect_db():
+    """
+    Connects to MongoDB, checks the connection and tries to make sure the
+    unique index on tender_id (which guards against duplicate inserts) exists.
+    Returns the tenders collection.
+    """
+    mongo_uri = os.environ.get("MONGO_URI")
+    if not mongo_uri:
+        logger.error("MONGO_URI not set in environment")
+        raise Exception("Please set the MONGO_URI environment variable.")
+
+    client = AsyncIOMotorClient(mongo_uri, tls=True, tlsCAFile=certifi.where())
+    try:
+        logger.info("Connected to MongoDB. Databases: %s", await client.list_database_names())
+    except Exception as e:
+        logger.error("Failed to connect to MongoDB: %s", e)
+        raise e
+    tender_collection = client["tender_db"]["tenders"]
+    try:
+        await tender_collection.create_index("tender_id", unique=True)
+    except OperationFailure as e:
+        # E.g. duplicate tender ids left by overlapping runs. Dedup still works
+        # through the in-memory set; remove the duplicates to get the index.
+        logger.error("Could not create unique index on tender_id: %s", e)
+    return tender_collection
+
+async def load_seen_tender_ids(tender_collection):
+    """
+    Loads every processed tender id from MongoDB into a set, so that duplicate
+    checks during the scrape are local lookups instead of database queries.
+    """
+    docs = await tender_collection.find({}, {"tender_id": 1, "_id": 0}).to_list(None)
+    seen_tender_ids = {d["tender_id"] for d in docs}
+    logger.info("Loaded %d processed tender IDs from DB.", len(seen_tender_ids))
+    return seen_tender_ids
+
+async def flush_inserts(tender_collection, pending_inserts):
+    """
+    Writes the queued InsertOne operations in a single unordered bulk_write.
+    Meant to run as a background task, so the caller hands over the list and
+    starts a new one. Duplicate-key errors from the unique index are logged
+    and tolerated; the remaining documents are still inserted.
+    """
+    if not pending_inserts:
+        return
+    try:
+        result = await tender_collection.bulk_write(pending_inserts, ordered=False)
+        logger.info("Inserted %d tender IDs into DB.", result.inserted_count)
+    except BulkWriteError as e:
+        logger.warning(
+            "Bulk insert finished with %d errors; %d tender IDs inserted.",
+            len(e.details.get("writeErrors", [])),
+            e.details.get("nInserted", 0),
+        )
+
+def send_emails(bodies):
+    """
+    Sends one "Tender List" email per HTML body over a single SMTP connection,
+    so the connect/STARTTLS/login handshake is paid once for the whole batch.
+    """
     sender_email = os.environ.get("EMAIL_FROM")
     recipient_email = os.environ.get("EMAIL_TO")
     smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
@@ -279,103 +599,141 @@ def send_email(body):
     smtp_username = os.environ.get("SMTP_USER")
     smtp_password = os.environ.get("SMTP_PASSWORD")
 
-    logger.info("Sending email from %s to %s...", sender_email, recipient_email)
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = "Tender List"
-    msg["From"] = sender_email
-    msg["To"] = recipient_email
-    msg.attach(MIMEText(body, "html"))
-
+    logger.info("Sending %d email(s) from %s to %s...", len(bodies), sender_email, recipient_email)
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.sendmail(sender_email, recipient_email, msg.as_string())
-        server.quit()
+        with smtplib.SMTP(smtp_server, smtp_port) as server:
+            server.starttls()
+            server.login(smtp_username, smtp_password)
+            for body in bodies:
+                msg = MIMEMultipart("alternative")
+                msg["Subject"] = "Tender List"
+                msg["From"] = sender_email
+                msg["To"] = recipient_email
+                msg.attach(MIMEText(body, "html"))
+                server.send_message(msg)
         logger.info("Email sent successfully.")
     except Exception as e:
         logger.error("Error sending email: %s", e)
 
-if __name__ == "__main__":
+def send_email(body):
+    send_emails([body])
+
+async def main():
     logger.info("Starting tender scraper...")
-    email_body = "<html><body>"
-    main_page_html = fetch_page(MAIN_URL)
-    if not main_page_html:
-        logger.error("Main page could not be fetched. Exiting.")
-        exit(1)
-    
-    department_table = get_department_table(main_page_html)
-    if not department_table:
-        logger.error("Department table not found. Exiting.")
-        exit(1)
-    
-    # Process each department in the list.
-    for dept in departments_to_search:
-        count=0
-        logger.info("Processing department: %s", dept)
-        dept_link = extract_department_link(department_table, dept)
-        email_body += f"<h2>Department: {dept}</h2>"
-        if not dept_link:
-            email_body += "<p>Not found or no link available.</p>"
-            continue
-        
-        org_page_html = fetch_page(dept_link)
-        if not org_page_html:
-            email_body += "<p>Failed to fetch organisation page.</p>"
-            continue
-        
-        tender_links = get_tender_links_from_org_page(org_page_html)
-        email_body += f"<p>Found {len(tender_links)} total tenders.</p>"
-        
-        for tender_url in tender_links:
-            logger.info("Processing tender URL: %s", tender_url)
-            detail_html = fetch_page(tender_url)
-            if not detail_html:
-                logger.warning("Failed to fetch tender details for URL: %s", tender_url)
-                continue
-            tender_values = get_tender_value(detail_html)
-            if tender_values is None:
-                save_failed_html(detail_html, tender_url)
-                email_body += f"<p>Failed to fetch tender details for <a href='{tender_url}'>{tender_url}</a></p>"
-                continue
-            
-            if tender_values["tender_id"] == "SKIP":
-                logger.info("Tender value >= 3000000. Skipping.")
-                continue
-
-            tender_id = tender_values["tender_id"]
-            if not tender_id:
-                logger.warning("Tender ID not extracted for URL: %s", tender_url)
-                continue
-
-            # Check if this tender has been processed already.
-            if tender_collection.find_one({"tender_id": tender_id}):
-                logger.info("Tender ID %s already processed. Skipping.", tender_id)
-                continue
-            
-            count+=1
-            tender_collection.insert_one({"tender_id": tender_id})
-            logger.info("Tender ID %s inserted into DB.", tender_id)
-            
-            email_body += (
-                f"<p><a href='{tender_url}'>Tender URL</a><br>"
-                f"Tender ID: {tender_values['tender_id']}<br>"
-                f"Tender Value in ₹: {tender_values['tender_value']}<br>"
-                f"Tender Type: {tender_values['tender_type']}<br>"
-                f"Organization Chain: {tender_values['tender_organization_chain']}<br>"
-                f"<b>Critical Dates:</b><br>"
-            )
-
-            tender_dates = tender_values["tender_dates"]
-            for date_label, date_value in tender_dates.items():
-                if date_value:
-                    formatted_label = date_label.replace('_', ' ').title()
-                    email_body += f"{formatted_label}: {date_value}<br>"
-            
-            email_body += "</p><hr>"
-        email_body += f"Fount {count} new tenders for {dept}<br>"
-    
-    email_body += "</body></html>"
+    logger.info("EMAIL_FROM: %s", os.environ.get("EMAIL_FROM"))
+    departments_to_search = get_departments_to_search()
+    # Whole seconds, so coarse filesystem mtimes never look older than the run.
+    run_started = int(time.time())
+    parts = ["<html><body>"]
+    # Parser workers are spawned, not forked: Motor/pymongo and asyncio run
+    # background threads, and forking a multithreaded process is not safe.
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    ) as parse_pool:
+        tender_collection = await connect_db()
+        seen_tender_ids = await load_seen_tender_ids(tender_collection)
+        connector = aiohttp.TCPConnector(limit=POOL_SIZE)
+        async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+            main_page_html = await fetch_page(session, MAIN_URL)
+            if not main_page_html:
+                logger.error("Main page could not be fetched. Exiting.")
+                exit(1)
+
+            department_table = get_department_table(main_page_html)
+            if not department_table:
+                logger.error("Department table not found. Exiting.")
+                exit(1)
+
+            dept_index = build_department_index(department_table)
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+            # Bulk inserts run in the background while the next pages download.
+            flush_tasks = []
+
+            # Process each department in the list.
+            for dept in departments_to_search:
+                count=0
+                logger.info("Processing department: %s", dept)
+                dept_link = dept_index.get(dept)
+                parts.append(f"<h2>Department: {dept}</h2>")
+                if not dept_link:
+                    logger.warning("Department '%s' not found in table.", dept)
+                    parts.append("<p>Not found or no link available.</p>")
+                    continue
+                logger.info("Found department '%s' link: %s", dept, dept_link)
+
+                org_page_html = await fetch_page(session, dept_link)
+                if not org_page_html:
+                    parts.append("<p>Failed to fetch organisation page.</p>")
+                    continue
+
+                tender_links = get_tender_links_from_org_page(org_page_html)
+                parts.append(f"<p>Found {len(tender_links)} total tenders.</p>")
+
+                # Download (and parse) all tender detail pages concurrently.
+                results = await asyncio.gather(
+                    *(fetch_tender(session, semaphore, parse_pool, url) for url in tender_links)
+                )
+
+                pending_inserts = []
+                for tender_url, detail_html, tender_values in results:
+                    if not detail_html:
+                        logger.warning("Failed to fetch tender details for URL: %s", tender_url)
+                        continue
+                    if tender_values is None:
+                        save_failed_html(detail_html, tender_url)
+                        parts.append(f"<p>Failed to fetch tender details for <a href='{tender_url}'>{tender_url}</a></p>")
+                        continue
+
+                    if tender_values["tender_id"] == "SKIP":
+                        logger.debug("Tender value >= %d. Skipping.", MAX_TENDER_VALUE)
+                        continue
+
+                    tender_id = tender_values["tender_id"]
+                    if not tender_id:
+                        logger.warning("Tender ID not extracted for URL: %s", tender_url)
+                        continue
+
+                    # Check if this tender has been processed already.
+                    if tender_id in seen_tender_ids:
+                        logger.debug("Tender ID %s already processed. Skipping.", tender_id)
+                        continue
+
+                    count+=1
+                    pending_inserts.append(InsertOne({"tender_id": tender_id}))
+                    seen_tender_ids.add(tender_id)
+                    logger.debug("Tender ID %s queued for insertion.", tender_id)
+                    if len(pending_inserts) >= INSERT_BATCH_SIZE:
+                        flush_tasks.append(asyncio.create_task(flush_inserts(tender_collection, pending_inserts)))
+                        pending_inserts = []
+
+                    parts.append(
+                        f"<p><a href='{tender_url}'>Tender URL</a><br>"
+                        f"Tender ID: {tender_values['tender_id']}<br>"
+                        f"Tender Value in ₹: {tender_values['tender_value']}<br>"
+                        f"Tender Type: {tender_values['tender_type']}<br>"
+                        f"Organization Chain: {tender_values['tender_organization_chain']}<br>"
+                        f"<b>Critical Dates:</b><br>"
+                    )
+
+                    tender_dates = tender_values["tender_dates"]
+                    for date_label, date_value in tender_dates.items():
+                        if date_value:
+                            formatted_label = date_label.replace('_', ' ').title()
+                            parts.append(f"{formatted_label}: {date_value}<br>")
+
+                    parts.append("</p><hr>")
+                flush_tasks.append(asyncio.create_task(flush_inserts(tender_collection, pending_inserts)))
+                parts.append(f"Fount {count} new tenders for {dept}<br>")
+
+            await asyncio.gather(*flush_tasks)
+    prune_cache(run_started)
+
+    parts.append("</body></html>")
+    email_body = "".join(parts)
     logger.info("Email body constructed. Now sending email.")
     send_email(email_body)
     logger.info("Tender scraper finished.")
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main())